@@ -10,6 +10,9 @@
 #
 
 import os
+import queue
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from argparse import ArgumentParser
 
 mipnerf360_outdoor_scenes = ["bicycle", "flowers", "garden", "stump", "treehill"]
@@ -22,8 +25,37 @@ parser.add_argument("--skip_training", action="store_true")
 parser.add_argument("--skip_rendering", action="store_true")
 parser.add_argument("--skip_metrics", action="store_true")
 parser.add_argument("--output_path", default="./eval")
+parser.add_argument("--gpus", default=None, type=str, help="comma separated GPU ids (indices into an inherited CUDA_VISIBLE_DEVICES), scenes are run in parallel one per GPU")
 args, _ = parser.parse_known_args()
 
+def run_jobs(commands):
+    # scenes are independent, so keep every listed GPU busy with its own subprocess
+    if args.gpus is None:
+        # no --gpus: run one scene at a time in the caller's environment, untouched
+        envs = [None]
+    else:
+        gpu_ids = args.gpus.split(",")
+        # the ids index the devices this process can see, so an inherited CUDA_VISIBLE_DEVICES is respected
+        visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+        if visible is not None:
+            visible = visible.split(",")
+            gpu_ids = [visible[int(gpu_id)] for gpu_id in gpu_ids]
+        envs = [dict(os.environ, CUDA_VISIBLE_DEVICES=gpu_id) for gpu_id in gpu_ids]
+    free_envs = queue.Queue()
+    for env in envs:
+        free_envs.put(env)
+
+    def run(command):
+        env = free_envs.get()
+        try:
+            subprocess.run(command, env=env, check=True)
+        finally:
+            free_envs.put(env)
+
+    with ThreadPoolExecutor(max_workers=len(envs)) as executor:
+        for job in [executor.submit(run, command) for command in commands]:
+            job.result()
+
 all_scenes = []
 all_scenes.extend(mipnerf360_outdoor_scenes)
 all_scenes.extend(mipnerf360_indoor_scenes)
@@ -37,19 +69,21 @@ if not args.skip_training or not args.skip_rendering:
     args = parser.parse_args()
 
 if not args.skip_training:
-    common_args = " --quiet --eval --test_iterations -1 "
+    common_args = ["--quiet", "--eval", "--test_iterations", "-1"]
+    commands = []
     for scene in mipnerf360_outdoor_scenes:
         source = args.mipnerf360 + "/" + scene
-        os.system("python train.py -s " + source + " -i images_4 -m " + args.output_path + "/" + scene + common_args)
+        commands.append(["python", "train.py", "-s", source, "-i", "images_4", "-m", args.output_path + "/" + scene] + common_args)
     for scene in mipnerf360_indoor_scenes:
         source = args.mipnerf360 + "/" + scene
-        os.system("python train.py -s " + source + " -i images_2 -m " + args.output_path + "/" + scene + common_args)
+        commands.append(["python", "train.py", "-s", source, "-i", "images_2", "-m", args.output_path + "/" + scene] + common_args)
     for scene in tanks_and_temples_scenes:
         source = args.tanksandtemples + "/" + scene
-        os.system("python train.py -s " + source + " -m " + args.output_path + "/" + scene + common_args)
+        commands.append(["python", "train.py", "-s", source, "-m", args.output_path + "/" + scene] + common_args)
     for scene in deep_blending_scenes:
         source = args.deepblending + "/" + scene
-        os.system("python train.py -s " + source + " -m " + args.output_path + "/" + scene + common_args)
+        commands.append(["python", "train.py", "-s", source, "-m", args.output_path + "/" + scene] + common_args)
+    run_jobs(commands)
 
 if not args.skip_rendering:
     all_sources = []
@@ -62,10 +96,12 @@ if not args.skip_rendering:
     for scene in deep_blending_scenes:
         all_sources.append(args.deepblending + "/" + scene)
 
-    common_args = " --quiet --eval --skip_train"
+    common_args = ["--quiet", "--eval", "--skip_train"]
+    commands = []
     for scene, source in zip(all_scenes, all_sources):
-        os.system("python render.py --iteration 7000 -s " + source + " -m " + args.output_path + "/" + scene + common_args)
-        os.system("python render.py --iteration 30000 -s " + source + " -m " + args.output_path + "/" + scene + common_args)
+        for iteration in ["7000", "30000"]:
+            commands.append(["python", "render.py", "--iteration", iteration, "-s", source, "-m", args.output_path + "/" + scene] + common_args)
+    run_jobs(commands)
 
 if not args.skip_metrics:
     scenes_string = ""
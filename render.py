@@ -9,98 +9,218 @@
 # For inquiries contact  george.drettakis@inria.fr
 #
 import imageio
-import numpy as np
 import torch
 from scene import Scene
 import os
 import cv2
 from tqdm import tqdm
+from torch.utils.data import DataLoader
 from os import makedirs
 from gaussian_renderer import render
-import torchvision
 from utils.general_utils import safe_state
 from argparse import ArgumentParser
 from arguments import ModelParams, PipelineParams, get_combined_args, ModelHiddenParams
 from gaussian_renderer import GaussianModel
 from time import time
 import threading
+import queue
 import concurrent.futures
+import atexit
+import functools
+import shutil
+import tempfile
 
-def multithread_write(image_list, path):
-    executor = concurrent.futures.ThreadPoolExecutor(max_workers=None)
-    def write_image(image, count, path):
-        try:
-            torchvision.utils.save_image(image, os.path.join(path, '{0:05d}'.format(count) + ".png"))
-            return count, True
-        except:
-            return count, False
-        
-    tasks = []
-    for index, image in enumerate(image_list):
-        tasks.append(executor.submit(write_image, image, index, path))
-    executor.shutdown()
-    for index, status in enumerate(tasks):
-        if status == False:
-            write_image(image_list[index], index, path)
-    
-to8b = lambda x : (255*np.clip(x.cpu().numpy(),0,1)).astype(np.uint8)
-
-def render_set(model_path, name, iteration, views, gaussians, pipeline, background, cam_type, load2gpu_on_the_fly, batch_size):
+# frames are intermediate results (they also feed the mp4), so trade a little size for fast zlib
+PNG_WRITE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1, cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_DEFAULT]
+
+# one writer pool for the whole process instead of spawning threads per batch / per render_set
+_IO_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 2))
+atexit.register(_IO_POOL.shutdown)
+# a single worker keeps mp4 frames in order
+_VIDEO_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+atexit.register(_VIDEO_POOL.shutdown)
+
+def write_image(image, count, path):
+    try:
+        ok = cv2.imwrite(os.path.join(path, '{0:05d}'.format(count) + ".png"),
+                         cv2.cvtColor(image, cv2.COLOR_RGB2BGR), PNG_WRITE_PARAMS)
+        return count, ok
+    except:
+        return count, False
+
+def submit_write(fn, *args, pool=_IO_POOL):
+    # keep the arguments next to the future so a failed write can be retried synchronously
+    return pool.submit(fn, *args), functools.partial(fn, *args)
+
+def wait_writes(tasks):
+    # the only write retry: rerun a failed write once, and say so if that fails too
+    for task, retry in tasks:
+        count, ok = task.result()
+        if not ok and not retry()[1]:
+            print(f"[Warning] could not write frame {count}")
+
+# quantize on the device and hand back a contiguous HWC uint8 array ready for cv2
+quantize = lambda x : x.clamp(0,1).mul(255).add_(0.5).to(torch.uint8).permute(1,2,0)
+tensor2img = lambda x : quantize(x).contiguous().cpu().numpy()
+
+# device scratch tensors reused across frames, keyed by (shape, dtype, device); every frame
+# of a set has the same resolution, so the render loop only ever cycles a couple of them
+_pool = {}
+
+def pool_get(shape, dtype, device):
+    free = _pool.setdefault((tuple(shape), dtype, str(device)), [])
+    return free.pop() if free else torch.empty(shape, dtype=dtype, device=device)
+
+def pool_release(t):
+    _pool.setdefault((tuple(t.shape), t.dtype, str(t.device)), []).append(t)
+
+def quantize_pooled(x):
+    # same result as quantize, but the float scratch and the HWC uint8 output come from _pool
+    tmp = torch.clamp(x, 0, 1, out=pool_get(x.shape, x.dtype, x.device))
+    out = pool_get((x.shape[1], x.shape[2], x.shape[0]), torch.uint8, x.device)
+    out.copy_(tmp.mul_(255).add_(0.5).permute(1, 2, 0))
+    pool_release(tmp)
+    return out
+
+def write_staged(buf, event, count, path):
+    # the D2H copy into the pinned buffer is async; wait for it before encoding
+    event.synchronize()
+    return write_image(buf.numpy(), count, path)
+
+def append_staged(writer, buf, event):
+    # the mp4 frame is read from the same pinned buffer as the PNG, so each frame crosses PCIe once
+    event.synchronize()
+    writer.append_data(buf.numpy())
+    return None, True
+
+def scratch_for(path, tag):
+    # many small writes to shared/network storage are slow: stage the frames on local scratch
+    # and move them over at the end, unless the scratch dir is on the same device anyway
+    if os.stat(tempfile.gettempdir()).st_dev == os.stat(path).st_dev:
+        return path
+    scratch = os.path.join(tempfile.gettempdir(), "render_{}_{}".format(os.getpid(), tag))
+    makedirs(scratch, exist_ok=True)
+    return scratch
+
+def flush_scratch(scratch, path):
+    if scratch == path:
+        return
+    # the moves hit the same slow storage the writes were staged away from, so spread them over the writer pool
+    moves = [_IO_POOL.submit(shutil.move, os.path.join(scratch, fname), os.path.join(path, fname))
+             for fname in os.listdir(scratch)]
+    for move in moves:
+        move.result()
+    os.rmdir(scratch)
+
+def write_tensor(image, count, path):
+    # quantizes in the writer thread, so a host-side image costs the render loop nothing
+    return write_image(tensor2img(image), count, path)
+
+def prefetch_to_device(loader, copy_stream):
+    # the H2D copy of a camera is issued on a side stream when the generator is advanced; the render
+    # loop advances it right after queueing render() of the current view, so the upload of the next
+    # one (an async DMA from its pinned image) overlaps that render. Each view comes with an event
+    # the compute stream waits on before using it, and with its gt image still on the host
+    for (view,) in loader:
+        host_gt = view.original_image
+        with torch.cuda.stream(copy_stream):
+            view.load2device()
+            loaded = torch.cuda.Event()
+            loaded.record()
+        yield view, loaded, host_gt
+
+def render_set(model_path, name, iteration, views, gaussians, pipeline, background, cam_type, load2gpu_on_the_fly, batch_size, video_codec="libx264"):
     render_path = os.path.join(model_path, name, "ours_{}".format(iteration), "renders")
     gts_path = os.path.join(model_path, name, "ours_{}".format(iteration), "gt")
 
     makedirs(render_path, exist_ok=True)
     makedirs(gts_path, exist_ok=True)
-    render_images = []
-    gt_list = []
-    render_list = []
+    scratch_render = scratch_for(render_path, "{}_{}_renders".format(name, iteration))
+    scratch_gts = scratch_for(gts_path, "{}_{}_gt".format(name, iteration))
+    # frames are streamed straight into ffmpeg instead of being held for the whole sequence
+    video_writer = imageio.get_writer(os.path.join(model_path, name, "ours_{}".format(iteration), 'video_rgb.mp4'), fps=30, codec=video_codec)
+    # PNG encoding runs on _IO_POOL while the GPU keeps rendering; the bounded
+    # queue only stalls the render loop once 2*batch_size frames are waiting on disk
+    pending = queue.Queue(maxsize=2 * batch_size)
+    # one pinned host buffer per frame that can be in flight, so the copy of a rendering
+    # back to the host is a true async DMA overlapping the next render() call
+    staging = [None] * (pending.maxsize + 1)
+    staged = [torch.cuda.Event() for _ in staging]
+    # worker processes build the next cameras while the GPU renders; they can only hand
+    # back cameras that live on the CPU, so otherwise loading stays in this process
+    num_workers = 4 if load2gpu_on_the_fly and cam_type != "PanopticSports" else 0
+    # the workers' cameras are pinned (see Camera.pin_memory) so their upload can be async
+    view_loader = DataLoader(views, batch_size=1, shuffle=False, num_workers=num_workers, collate_fn=list,
+                             prefetch_factor=4 if num_workers > 0 else 2, pin_memory=num_workers > 0)
+    # the set name, cam_type and load2gpu_on_the_fly are fixed for the whole loop: pick the
+    # per-frame steps once here instead of re-testing them for every view
+    if name not in ["train", "test"]:
+        get_gt = lambda view, host_gt : None
+    elif cam_type == "PanopticSports":
+        get_gt = lambda view, host_gt : view['image'].cuda()
+    elif load2gpu_on_the_fly:
+        # the gt is written from the host copy, so the render loop never waits on a D2H copy of it
+        get_gt = lambda view, host_gt : host_gt[0:3, :, :] if host_gt is not None else None
+    else:
+        get_gt = lambda view, host_gt : view.original_image[0:3, :, :] if view.original_image is not None else None
+    if load2gpu_on_the_fly and num_workers == 0:
+        # these are the dataset's own cameras, put them back on the cpu (this syncs the compute stream)
+        offload = lambda view : view.load2device("cpu")
+    else:
+        # a worker's camera is a copy that is simply dropped: its device tensors are freed once the
+        # compute stream is done with them (see Camera.record_stream), without a sync
+        offload = lambda view : None
     print("point nums:",gaussians._xyz.shape[0])
-    for idx, view in enumerate(tqdm(views, desc="Rendering progress")):
-        if idx == 0:time1 = time()
+    if load2gpu_on_the_fly:
+        view_iter = prefetch_to_device(view_loader, torch.cuda.Stream())
+    else:
+        view_iter = ((view, None, None) for (view,) in view_loader)
+    # drain, move and close even if rendering fails, so no frames are left behind in the scratch dirs
+    try:
+        ahead = next(view_iter, None)
+        for idx in tqdm(range(len(views)), desc="Rendering progress"):
+            if idx == 0:time1 = time()
 
-        if load2gpu_on_the_fly:
-            view.load2device()
+            view, loaded, host_gt = ahead
+            if loaded is not None:
+                torch.cuda.current_stream().wait_event(loaded)
+                view.record_stream(torch.cuda.current_stream())
         
-        rendering = render(view, gaussians, pipeline, background,cam_type=cam_type)["render"]
-        render_images.append(to8b(rendering).transpose(1,2,0))
-        render_list.append(rendering.to("cpu"))
-
-        if load2gpu_on_the_fly:
-            view.load2device("cpu")
-
-        if name in ["train", "test"]:
-            if cam_type != "PanopticSports":
-                if view.original_image is not None:
-                    gt = view.original_image[0:3, :, :]
-                else:
-                    gt = None
-            else:
-                gt  = view['image'].cuda()
-            gt_list.append(gt)
-
-        # Avoiding keeping all images in RAM
-        if len(render_list) >= batch_size:
-            if not gt_list == []:
-                multithread_write(gt_list, gts_path)
-
-            multithread_write(render_list, render_path)
-            
-            gt_list = []
-            render_list = []
-
-
-    time2=time()
-    print("FPS:",(len(views)-1)/(time2-time1))
-
-    if len(render_list) > 0:
-        if not gt_list == []:
-            multithread_write(gt_list, gts_path)
-
-        multithread_write(render_list, render_path)
-
-    
-    imageio.mimwrite(os.path.join(model_path, name, "ours_{}".format(iteration), 'video_rgb.mp4'), render_images, fps=30)
-def render_sets(dataset : ModelParams, hyperparam, iteration : int, pipeline : PipelineParams, skip_train : bool, skip_test : bool, skip_video: bool, batch_size: int):
+            rendering = render(view, gaussians, pipeline, background,cam_type=cam_type)["render"]
+            # render() of this view is queued, only now start the upload of the next one
+            ahead = next(view_iter, None)
+            slot = idx % len(staging)
+            img = quantize_pooled(rendering)
+            if staging[slot] is None or staging[slot].shape != img.shape:
+                staging[slot] = torch.empty(img.shape, dtype=torch.uint8, pin_memory=True)
+            staging[slot].copy_(img, non_blocking=True)
+            staged[slot].record()
+            # later reuse of img is ordered after the copy on the same stream
+            pool_release(img)
+            tasks = [submit_write(write_staged, staging[slot], staged[slot], idx, scratch_render),
+                     submit_write(append_staged, video_writer, staging[slot], staged[slot], pool=_VIDEO_POOL)]
+
+            offload(view)
+
+            gt = get_gt(view, host_gt)
+            if gt is not None:
+                tasks.append(submit_write(write_tensor, gt, idx, scratch_gts))
+
+            if pending.full():
+                wait_writes(pending.get())
+            pending.put(tasks)
+
+        time2=time()
+        print("FPS:",(len(views)-1)/(time2-time1))
+    finally:
+        try:
+            while not pending.empty():
+                wait_writes(pending.get())
+        finally:
+            flush_scratch(scratch_render, render_path)
+            flush_scratch(scratch_gts, gts_path)
+            video_writer.close()
+def render_sets(dataset : ModelParams, hyperparam, iteration : int, pipeline : PipelineParams, skip_train : bool, skip_test : bool, skip_video: bool, batch_size: int, video_codec: str):
     with torch.no_grad():
         gaussians = GaussianModel(dataset.sh_degree, hyperparam)
         scene = Scene(dataset, gaussians, load_iteration=iteration, shuffle=False)
@@ -109,12 +229,12 @@ def render_sets(dataset : ModelParams, hyperparam, iteration : int, pipeline : P
         background = torch.tensor(bg_color, dtype=torch.float32, device="cuda")
 
         if not skip_train:
-            render_set(dataset.model_path, "train", scene.loaded_iter, scene.getTrainCameras(), gaussians, pipeline, background,cam_type, load2gpu_on_the_fly = dataset.load2gpu_on_the_fly, batch_size = batch_size)
+            render_set(dataset.model_path, "train", scene.loaded_iter, scene.getTrainCameras(), gaussians, pipeline, background,cam_type, load2gpu_on_the_fly = dataset.load2gpu_on_the_fly, batch_size = batch_size, video_codec = video_codec)
 
         if not skip_test:
-            render_set(dataset.model_path, "test", scene.loaded_iter, scene.getTestCameras(), gaussians, pipeline, background,cam_type, load2gpu_on_the_fly = dataset.load2gpu_on_the_fly, batch_size = batch_size)
+            render_set(dataset.model_path, "test", scene.loaded_iter, scene.getTestCameras(), gaussians, pipeline, background,cam_type, load2gpu_on_the_fly = dataset.load2gpu_on_the_fly, batch_size = batch_size, video_codec = video_codec)
         if not skip_video:
-            render_set(dataset.model_path,"video",scene.loaded_iter,scene.getVideoCameras(),gaussians,pipeline,background,cam_type, load2gpu_on_the_fly = dataset.load2gpu_on_the_fly, batch_size = batch_size)
+            render_set(dataset.model_path,"video",scene.loaded_iter,scene.getVideoCameras(),gaussians,pipeline,background,cam_type, load2gpu_on_the_fly = dataset.load2gpu_on_the_fly, batch_size = batch_size, video_codec = video_codec)
 if __name__ == "__main__":
     # Set up command line argument parser
     parser = ArgumentParser(description="Testing script parameters")
@@ -123,6 +243,8 @@ if __name__ == "__main__":
     hyperparam = ModelHiddenParams(parser)
     parser.add_argument("--iteration", default=-1, type=int)
     parser.add_argument("--batch_size", default=32, type=int)
+    # e.g. h264_nvenc to encode the mp4 on the GPU's NVENC block instead of with libx264 on the CPU
+    parser.add_argument("--video_codec", default="libx264", type=str)
     parser.add_argument("--skip_train", action="store_true")
     parser.add_argument("--skip_test", action="store_true")
     parser.add_argument("--quiet", action="store_true")
@@ -138,4 +260,4 @@ if __name__ == "__main__":
     # Initialize system state (RNG)
     safe_state(args.quiet)
 
-    render_sets(model.extract(args), hyperparam.extract(args), args.iteration, pipeline.extract(args), args.skip_train, args.skip_test, args.skip_video, args.batch_size)
\ No newline at end of file
+    render_sets(model.extract(args), hyperparam.extract(args), args.iteration, pipeline.extract(args), args.skip_train, args.skip_test, args.skip_video, args.batch_size, args.video_codec)
\ No newline at end of file
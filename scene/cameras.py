@@ -90,15 +90,33 @@ class Camera(nn.Module):
         self.full_proj_transform = (self.world_view_transform.unsqueeze(0).bmm(self.projection_matrix.unsqueeze(0))).squeeze(0)
         self.camera_center = self.world_view_transform.inverse()[3, :3]
 
+    def pin_memory(self):
+        # picked up by DataLoader(pin_memory=True): page-lock the cpu gt image so the upload is an async DMA
+        if self.original_image is not None and self.original_image.device.type == "cpu":
+            self.original_image = self.original_image.pin_memory()
+        return self
+
     def load2device(self, data_device='cuda'):
+        # uploads are queued without blocking the host: from a pinned image (see pin_memory) the copy is an
+        # async DMA, and the pinned source stays alive until it is done. Copies back to the cpu stay blocking
+        # so the host never reads a tensor that is still being written
+        non_blocking = torch.device(data_device).type != "cpu"
         if self.original_image is not None:
-            self.original_image = self.original_image.to(data_device)
-        self.world_view_transform = self.world_view_transform.to(data_device)
-        self.projection_matrix = self.projection_matrix.to(data_device)
-        self.full_proj_transform = self.full_proj_transform.to(data_device)
-        self.camera_center = self.camera_center.to(data_device)
+            self.original_image = self.original_image.to(data_device, non_blocking=non_blocking)
+        self.world_view_transform = self.world_view_transform.to(data_device, non_blocking=non_blocking)
+        self.projection_matrix = self.projection_matrix.to(data_device, non_blocking=non_blocking)
+        self.full_proj_transform = self.full_proj_transform.to(data_device, non_blocking=non_blocking)
+        self.camera_center = self.camera_center.to(data_device, non_blocking=non_blocking)
         # self.time = self.time.to(data_device)
 
+    def record_stream(self, stream):
+        # device tensors uploaded on a side stream are also used on `stream`: tell the caching allocator,
+        # so dropping the camera doesn't hand their memory out again while `stream` still reads it
+        for tensor in (self.original_image, self.world_view_transform, self.projection_matrix,
+                       self.full_proj_transform, self.camera_center):
+            if tensor is not None and tensor.is_cuda:
+                tensor.record_stream(stream)
+
 class MiniCam:
     def __init__(self, width, height, fovy, fovx, znear, zfar, world_view_transform, full_proj_transform, time):
         self.image_width = width
@@ -52,6 +52,21 @@ def qvec2rotmat(qvec):
          2 * qvec[2] * qvec[3] + 2 * qvec[0] * qvec[1],
          1 - 2 * qvec[1]**2 - 2 * qvec[2]**2]])
 
+def qvec2rotmat_batched(qvecs):
+    # qvec2rotmat for an (N, 4) array of quaternions at once -> (N, 3, 3)
+    w, x, y, z = qvecs[:, 0], qvecs[:, 1], qvecs[:, 2], qvecs[:, 3]
+    R = np.empty((qvecs.shape[0], 3, 3), dtype=np.float64)
+    R[:, 0, 0] = 1 - 2 * y**2 - 2 * z**2
+    R[:, 0, 1] = 2 * x * y - 2 * w * z
+    R[:, 0, 2] = 2 * z * x + 2 * w * y
+    R[:, 1, 0] = 2 * x * y + 2 * w * z
+    R[:, 1, 1] = 1 - 2 * x**2 - 2 * z**2
+    R[:, 1, 2] = 2 * y * z - 2 * w * x
+    R[:, 2, 0] = 2 * z * x - 2 * w * y
+    R[:, 2, 1] = 2 * y * z + 2 * w * x
+    R[:, 2, 2] = 1 - 2 * x**2 - 2 * y**2
+    return R
+
 def rotmat2qvec(R):
     Rxx, Ryx, Rzx, Rxy, Ryy, Rzy, Rxz, Ryz, Rzz = R.flat
     K = np.array([
@@ -18,35 +18,41 @@ class FourDGSdataset(Dataset):
         self.args = args
         self.dataset_type=dataset_type
         self.resolution_scale = resolution_scale
+        # focal and image size are fixed for a dataset, so the fov trig only runs once per resolution
+        self._fovs = {}
+        # the item layout is fixed per dataset: decide once here instead of try/except per item.
+        # The dynerf / multipleview datasets (the ones with load_pose) return (image, (R, T), time);
+        # CameraInfo lists and Load_hyper_data return CameraInfos. Decided from the type, loading a
+        # sample here would decode a frame every time a FourDGSdataset is built
+        if self.dataset_type == "PanopticSports":
+            self._fetch = self._fetch_raw
+        elif hasattr(dataset, "load_pose"):
+            self._fetch = self._fetch_tuple
+        else:
+            self._fetch = self._fetch_caminfo
+    def _fov(self, width, height):
+        fov = self._fovs.get((width, height))
+        if fov is None:
+            fov = self._fovs[(width, height)] = (focal2fov(self.dataset.focal[0], width),
+                                                 focal2fov(self.dataset.focal[0], height))
+        return fov
     def __getitem__(self, index):
-        # breakpoint()
-
-        if self.dataset_type != "PanopticSports":
-            try:
-                image, w2c, time = self.dataset[index]
-                R,T = w2c
-                FovX = focal2fov(self.dataset.focal[0], image.shape[2])
-                FovY = focal2fov(self.dataset.focal[0], image.shape[1])
-                mask=None
+        return self._fetch(index)
+    def _fetch_tuple(self, index):
+        image, w2c, time = self.dataset[index]
+        R,T = w2c
+        FovX, FovY = self._fov(image.shape[2], image.shape[1])
+        mask=None
 
-                return Camera(colmap_id=index,R=R,T=T,FoVx=FovX,FoVy=FovY,image=image,gt_alpha_mask=None,
-                              image_name=f"{index}",uid=index,data_device=args.data_device if not args.load2gpu_on_the_fly else 'cpu',
-                              time=time,
-                              mask=mask)
-            except:
-                caminfo = self.dataset[index]
-                # image = caminfo.image
-                # R = caminfo.R
-                # T = caminfo.T
-                # FovX = caminfo.FovX
-                # FovY = caminfo.FovY
-                # time = caminfo.time
-                # K = caminfo.K
-    
-                # mask = caminfo.mask
-                return loadCam(self.args, index, caminfo, self.resolution_scale)
-        else:
-            return self.dataset[index]
+        return Camera(colmap_id=index,R=R,T=T,FoVx=FovX,FoVy=FovY,image=image,gt_alpha_mask=None,
+                      image_name=f"{index}",uid=index,data_device=self.args.data_device if not self.args.load2gpu_on_the_fly else 'cpu',
+                      time=time,
+                      mask=mask)
+    def _fetch_caminfo(self, index):
+        caminfo = self.dataset[index]
+        return loadCam(self.args, index, caminfo, self.resolution_scale)
+    def _fetch_raw(self, index):
+        return self.dataset[index]
     def __len__(self):
         
         return len(self.dataset)
@@ -10,17 +10,18 @@
 #
 
 import os
+import io
 import sys
 from PIL import Image
 from scene.cameras import Camera
 
 from typing import NamedTuple, Optional
-from scene.colmap_loader import read_extrinsics_text, read_intrinsics_text, qvec2rotmat, \
+from scene.colmap_loader import read_extrinsics_text, read_intrinsics_text, qvec2rotmat_batched, \
     read_extrinsics_binary, read_intrinsics_binary, read_points3D_binary, read_points3D_text
 from scene.hyper_loader import Load_hyper_data, format_hyper_data
 import torchvision.transforms as transforms
 import copy
-from utils.graphics_utils import getWorld2View2, focal2fov, fov2focal, getProjectionMatrix, ndc2Pix
+from utils.graphics_utils import getWorld2View2, focal2fov, fov2focal, getProjectionMatrix
 import numpy as np
 import torch
 import json
@@ -32,11 +33,21 @@ from pathlib import Path
 from plyfile import PlyData, PlyElement
 from utils.sh_utils import SH2RGB
 from scene.gaussian_model import BasicPointCloud
-from utils.general_utils import PILtoTorch
+from utils.general_utils import PILtoTorch, NPtoTorch, LazyImage
 from utils.camera_utils import Intrinsics
-from utils.image_utils import load_img
+from utils.image_utils import load_img, composite_rgba, read_rgba
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
 from utils.camera_utils_multinerf import generate_interpolated_path
+from scene.hull_utils import NUMBA_FOUND, stack_masks, in_bounds
+from scene.io_uring_reader import IO_URING_FOUND, bulk_read
+if NUMBA_FOUND:
+    from scene.hull_utils import count_visible
+
+# write ./cam_img.png with the hull grid points each first-frame camera sees, for debugging the hull init
+DEBUG_SAVE_CAM_IMG = False
+# plot the training camera orientations against the initial point cloud when loading a scene
+DEBUG_PLOT_CAMS = False
 
 class CameraInfo(NamedTuple):
     uid: int
@@ -65,22 +76,13 @@ class SceneInfo(NamedTuple):
     maxtime: int
 
 def getNerfppNorm(cam_info):
-    def get_center_and_diag(cam_centers):
-        cam_centers = np.hstack(cam_centers)
-        avg_cam_center = np.mean(cam_centers, axis=1, keepdims=True)
-        center = avg_cam_center
-        dist = np.linalg.norm(cam_centers - center, axis=0, keepdims=True)
-        diagonal = np.max(dist)
-        return center.flatten(), diagonal
-
-    cam_centers = []
-
-    for cam in cam_info:
-        W2C = getWorld2View2(cam.R, cam.T)
-        C2W = np.linalg.inv(W2C)
-        cam_centers.append(C2W[:3, 3:4])
-
-    center, diagonal = get_center_and_diag(cam_centers)
+    # camera centers of all cameras at once: W2C = [R^T | T], so C2W[:3, 3] = -R @ T
+    Rs = np.stack([cam.R for cam in cam_info])
+    Ts = np.stack([cam.T for cam in cam_info])
+    cam_centers = -np.einsum('nij,nj->ni', Rs, Ts)
+
+    center = cam_centers.mean(axis=0)
+    diagonal = np.linalg.norm(cam_centers - center, axis=1).max()
     radius = diagonal * 1.1
 
     translate = -center
@@ -89,20 +91,23 @@ def getNerfppNorm(cam_info):
 
 def readColmapCameras(cam_extrinsics, cam_intrinsics, images_folder):
     cam_infos = []
-    for idx, key in enumerate(cam_extrinsics):
+    # rotations and translations of every image in one go
+    extrs = list(cam_extrinsics.values())
+    Rs = np.transpose(qvec2rotmat_batched(np.array([extr.qvec for extr in extrs]).reshape(-1, 4)), (0, 2, 1))
+    Ts = np.array([extr.tvec for extr in extrs]).reshape(-1, 3)
+    for idx, extr in enumerate(extrs):
         sys.stdout.write('\r')
         # the exact output you're looking for:
         sys.stdout.write("Reading camera {}/{}".format(idx+1, len(cam_extrinsics)))
         sys.stdout.flush()
 
-        extr = cam_extrinsics[key]
         intr = cam_intrinsics[extr.camera_id]
         height = intr.height
         width = intr.width
 
         uid = intr.id
-        R = np.transpose(qvec2rotmat(extr.qvec))
-        T = np.array(extr.tvec)
+        R = Rs[idx]
+        T = Ts[idx]
 
         if intr.model in ["SIMPLE_PINHOLE", "SIMPLE_RADIAL"]:
             focal_length_x = intr.params[0]
@@ -123,8 +128,8 @@ def readColmapCameras(cam_extrinsics, cam_intrinsics, images_folder):
 
         image_path = os.path.join(images_folder, os.path.basename(extr.name))
         image_name = os.path.basename(image_path).split(".")[0]
-        image = Image.open(image_path)
-        image = PILtoTorch(image,None)
+        # decoded on first use by loadCam, listing the cameras only needs the metadata
+        image = LazyImage(image_path)
         cam_info = CameraInfo(uid=uid, R=R, T=T, FovY=FovY, FovX=FovX, image=image,
                               image_path=image_path, image_name=image_name, width=width, height=height,
                               time = float(idx/len(cam_extrinsics)), mask=None) # default by monocular settings.
@@ -133,11 +138,16 @@ def readColmapCameras(cam_extrinsics, cam_intrinsics, images_folder):
     return cam_infos
 
 def fetchPly(path):
-    plydata = PlyData.read(path)
-    vertices = plydata['vertex']
-    positions = np.vstack([vertices['x'], vertices['y'], vertices['z']]).T
-    colors = np.vstack([vertices['red'], vertices['green'], vertices['blue']]).T / 255.0
-    normals = np.vstack([vertices['nx'], vertices['ny'], vertices['nz']]).T
+    try:
+        # map the binary vertex block instead of reading it into memory, np.stack copies out of the mapping
+        plydata = PlyData.read(path, mmap=True)
+    except TypeError: # plyfile < 0.7 has no mmap argument
+        plydata = PlyData.read(path)
+    vertices = plydata['vertex'].data
+    positions = np.stack((vertices['x'], vertices['y'], vertices['z']), axis=1).astype(np.float32, copy=False)
+    colors = np.stack((vertices['red'], vertices['green'], vertices['blue']), axis=1).astype(np.float32)
+    colors *= np.float32(1.0 / 255.0)
+    normals = np.stack((vertices['nx'], vertices['ny'], vertices['nz']), axis=1).astype(np.float32, copy=False)
     return BasicPointCloud(points=positions, colors=colors, normals=normals)
 
 def storePly(path, xyz, rgb):
@@ -146,12 +156,10 @@ def storePly(path, xyz, rgb):
             ('nx', 'f4'), ('ny', 'f4'), ('nz', 'f4'),
             ('red', 'f4'), ('green', 'f4'), ('blue', 'f4')]
     
-    normals = np.zeros_like(xyz)
-
-    elements = np.empty(xyz.shape[0], dtype=dtype)
-    # breakpoint()
-    attributes = np.concatenate((xyz, normals, rgb), axis=1)
-    elements[:] = list(map(tuple, attributes))
+    # fill the structured array field by field (plain C copies) rather than through per-point tuples
+    elements = np.zeros(xyz.shape[0], dtype=dtype)
+    elements['x'], elements['y'], elements['z'] = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    elements['red'], elements['green'], elements['blue'] = rgb[:, 0], rgb[:, 1], rgb[:, 2]
 
     # Create the PlyData object and write to file
     vertex_element = PlyElement.describe(elements, 'vertex')
@@ -209,32 +217,27 @@ def readColmapSceneInfo(path, images, eval, llffhold=8):
                            ply_path=ply_path)
     return scene_info
 def generateCamerasFromTransforms(path, template_transformsfile, extension, maxtime):
-    trans_t = lambda t : torch.Tensor([
-    [1,0,0,0],
-    [0,1,0,0],
-    [0,0,1,t],
-    [0,0,0,1]]).float()
-
-    rot_phi = lambda phi : torch.Tensor([
-        [1,0,0,0],
-        [0,np.cos(phi),-np.sin(phi),0],
-        [0,np.sin(phi), np.cos(phi),0],
-        [0,0,0,1]]).float()
-
-    rot_theta = lambda th : torch.Tensor([
-        [np.cos(th),0,-np.sin(th),0],
-        [0,1,0,0],
-        [np.sin(th),0, np.cos(th),0],
-        [0,0,0,1]]).float()
-    def pose_spherical(theta, phi, radius):
-        c2w = trans_t(radius)
-        c2w = rot_phi(phi/180.*np.pi) @ c2w
-        c2w = rot_theta(theta/180.*np.pi) @ c2w
-        c2w = torch.Tensor(np.array([[-1,0,0,0],[0,0,1,0],[0,1,0,0],[0,0,0,1]])) @ c2w
-        return c2w
+    def pose_spherical(thetas, phi, radius):
+        # c2w = flip @ rot_theta(theta) @ rot_phi(phi) @ trans_t(radius), for every theta at once
+        trans_t = np.eye(4)
+        trans_t[2, 3] = radius
+        phi = phi/180.*np.pi
+        rot_phi = np.array([
+            [1,0,0,0],
+            [0,np.cos(phi),-np.sin(phi),0],
+            [0,np.sin(phi), np.cos(phi),0],
+            [0,0,0,1]])
+        thetas = thetas/180.*np.pi
+        rot_theta = np.zeros((len(thetas), 4, 4))
+        rot_theta[:, 0, 0] = rot_theta[:, 2, 2] = np.cos(thetas)
+        rot_theta[:, 0, 2] = -np.sin(thetas)
+        rot_theta[:, 2, 0] = np.sin(thetas)
+        rot_theta[:, 1, 1] = rot_theta[:, 3, 3] = 1
+        flip = np.array([[-1,0,0,0],[0,0,1,0],[0,1,0,0],[0,0,0,1]])
+        return np.einsum('ij,njk,kl->nil', flip, rot_theta, rot_phi @ trans_t)
     cam_infos = []
     # generate render poses and times
-    render_poses = torch.stack([pose_spherical(angle, -30.0, 4.0) for angle in np.linspace(-180,180,160+1)[:-1]], 0)
+    render_poses = torch.from_numpy(pose_spherical(np.linspace(-180,180,160+1)[:-1], -30.0, 4.0)).float()
     render_times = torch.linspace(0,maxtime,render_poses.shape[0])
     with open(os.path.join(path, template_transformsfile)) as json_file:
         template_json = json.load(json_file)
@@ -244,19 +247,12 @@ def generateCamerasFromTransforms(path, template_transformsfile, extension, maxt
             fovx = focal2fov(template_json["fl_x"], template_json['w'])
     print("hello!!!!")
     # breakpoint()
-    # load a single image to get image info.
-    for idx, frame in enumerate(template_json["frames"]):
-        cam_name = os.path.join(path, frame["file_path"] + extension)
-        image_path = os.path.join(path, cam_name)
-        image_name = Path(cam_name).stem
-        image = Image.open(image_path)
-        im_data = np.array(image.convert("RGBA"))
-        image = PILtoTorch(image,(800,800))
-        break
+    # only the shape of the placeholder image is used, frames are always resized to 800x800
+    image = torch.zeros(3, 800, 800)
     # format information
-    for idx, (time, poses) in enumerate(zip(render_times,render_poses)):
+    matrices = torch.linalg.inv(render_poses).numpy()
+    for idx, (time, matrix) in enumerate(zip(render_times,matrices)):
         time = time/maxtime
-        matrix = np.linalg.inv(np.array(poses))
         R = -np.transpose(matrix[:3,:3])
         R[:,0] = -R[:,0]
         T = -matrix[:3, 3]
@@ -267,9 +263,27 @@ def generateCamerasFromTransforms(path, template_transformsfile, extension, maxt
                             image_path=None, image_name=None, width=image.shape[1], height=image.shape[2],
                             time = time, mask=None))
     return cam_infos
-def readCamerasFromTransforms(path, transformsfile, white_background, extension=".png", mapper = {}):
-    cam_infos = []
+def readTransformsFrame(path, frame, idx, fovx, white_background, extension, mapper):
+    cam_name = os.path.join(path, frame["file_path"] + extension)
+    time = mapper[frame["time"]]
+    matrix = np.linalg.inv(np.array(frame["transform_matrix"]))
+    R = -np.transpose(matrix[:3,:3])
+    R[:,0] = -R[:,0]
+    T = -matrix[:3, 3]
+
+    image_path = os.path.join(path, cam_name)
+    image_name = Path(cam_name).stem
+    im_data = read_rgba(image_path)
+    image = NPtoTorch(composite_rgba(im_data, white_background), (800,800))
+    fovy = focal2fov(fov2focal(fovx, image.shape[1]), image.shape[2])
+    FovY = fovy 
+    FovX = fovx
+
+    return CameraInfo(uid=idx, R=R, T=T, FovY=FovY, FovX=FovX, image=image,
+                      image_path=image_path, image_name=image_name, width=image.shape[1], height=image.shape[2],
+                      time = time, mask=None)
 
+def readCamerasFromTransforms(path, transformsfile, white_background, extension=".png", mapper = {}):
     with open(os.path.join(path, transformsfile)) as json_file:
         contents = json.load(json_file)
         try:
@@ -277,34 +291,11 @@ def readCamerasFromTransforms(path, transformsfile, white_background, extension=
         except:
             fovx = focal2fov(contents['fl_x'],contents['w'])
         frames = contents["frames"]
-        for idx, frame in enumerate(frames):
-            cam_name = os.path.join(path, frame["file_path"] + extension)
-            time = mapper[frame["time"]]
-            matrix = np.linalg.inv(np.array(frame["transform_matrix"]))
-            R = -np.transpose(matrix[:3,:3])
-            R[:,0] = -R[:,0]
-            T = -matrix[:3, 3]
-
-            image_path = os.path.join(path, cam_name)
-            image_name = Path(cam_name).stem
-            image = Image.open(image_path)
-
-            im_data = np.array(image.convert("RGBA"))
-
-            bg = np.array([1,1,1]) if white_background else np.array([0, 0, 0])
-
-            norm_data = im_data / 255.0
-            arr = norm_data[:,:,:3] * norm_data[:, :, 3:4] + bg * (1 - norm_data[:, :, 3:4])
-            image = Image.fromarray(np.array(arr*255.0, dtype=np.byte), "RGB")
-            image = PILtoTorch(image,(800,800))
-            fovy = focal2fov(fov2focal(fovx, image.shape[1]), image.shape[2])
-            FovY = fovy 
-            FovX = fovx
-
-            cam_infos.append(CameraInfo(uid=idx, R=R, T=T, FovY=FovY, FovX=FovX, image=image,
-                            image_path=image_path, image_name=image_name, width=image.shape[1], height=image.shape[2],
-                            time = time, mask=None))
-            
+    # decoding and compositing are independent per frame and PIL releases the GIL while decoding;
+    # map keeps the frame order
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        cam_infos = list(tqdm(executor.map(lambda args: readTransformsFrame(path, args[1], args[0], fovx, white_background, extension, mapper),
+                                           enumerate(frames)), total=len(frames)))
     return cam_infos
 
 def read_timeline(path):
@@ -362,22 +353,26 @@ def readNerfSyntheticInfo(path, white_background, eval, extension=".png"):
                            maxtime=max_time
                            )
     return scene_info
+def share_placeholder(image):
+    if torch.is_tensor(image):
+        image = image.detach().contiguous()
+        image.share_memory_()
+    return image
+
 def format_infos(dataset,split):
     # loading
     cameras = []
-    image = dataset[0][0]
+    # every CameraInfo below holds this one placeholder image, shared so forked loader workers don't copy it
+    image = share_placeholder(dataset[0][0])
     if split == "train":
+        # the placeholder and focal are shared, so the fovs are the same for every camera
+        FovX = focal2fov(dataset.focal[0], image.shape[1])
+        FovY = focal2fov(dataset.focal[0], image.shape[2])
         for idx in tqdm(range(len(dataset))):
-            image_path = None
-            image_name = f"{idx}"
-            time = dataset.image_times[idx]
-            # matrix = np.linalg.inv(np.array(pose))
             R,T = dataset.load_pose(idx)
-            FovX = focal2fov(dataset.focal[0], image.shape[1])
-            FovY = focal2fov(dataset.focal[0], image.shape[2])
             cameras.append(CameraInfo(uid=idx, R=R, T=T, FovY=FovY, FovX=FovX, image=image,
-                                image_path=image_path, image_name=image_name, width=image.shape[2], height=image.shape[1],
-                                time = time, mask=None))
+                                image_path=None, image_name=f"{idx}", width=image.shape[2], height=image.shape[1],
+                                time = dataset.image_times[idx], mask=None))
 
     return cameras
 
@@ -399,7 +394,9 @@ def readHyperDataInfos(datadir,use_bg_points,eval):
 
     pcd = pcd._replace(points=xyz)
     nerf_normalization = getNerfppNorm(train_cam)
-    plot_camera_orientations(train_cam_infos, pcd.points)
+    if DEBUG_PLOT_CAMS:
+        # diagnostic only; train_cam has the same poses as train_cam_infos without decoding any image
+        plot_camera_orientations(train_cam, pcd.points)
     scene_info = SceneInfo(point_cloud=pcd,
                            train_cameras=train_cam_infos,
                            test_cameras=test_cam_infos,
@@ -411,42 +408,39 @@ def readHyperDataInfos(datadir,use_bg_points,eval):
 
     return scene_info
 def format_render_poses(poses,data_infos):
-    cameras = []
     tensor_to_pil = transforms.ToPILImage()
     len_poses = len(poses)
     times = [i/len_poses for i in range(len_poses)]
-    image = data_infos[0][0]
-    for idx, p in tqdm(enumerate(poses)):
-        # image = None
-        image_path = None
-        image_name = f"{idx}"
-        time = times[idx]
-        pose = np.eye(4)
-        pose[:3,:] = p[:3,:]
-        # matrix = np.linalg.inv(np.array(pose))
-        R = pose[:3,:3]
-        R = - R
-        R[:,0] = -R[:,0]
-        T = -pose[:3,3].dot(R)
-        FovX = focal2fov(data_infos.focal[0], image.shape[2])
-        FovY = focal2fov(data_infos.focal[0], image.shape[1])
-        cameras.append(CameraInfo(uid=idx, R=R, T=T, FovY=FovY, FovX=FovX, image=image,
-                            image_path=image_path, image_name=image_name, width=image.shape[2], height=image.shape[1],
-                            time = time, mask=None))
+    # shared placeholder, only its shape is used
+    image = share_placeholder(data_infos[0][0])
+    # flip all poses at once: R = -pose[:3,:3] with the first column restored, T = -pose[:3,3] @ R
+    Ps = np.stack([p[:3,:] for p in poses]).astype(np.float64)
+    Rs = -Ps[:, :3, :3]
+    Rs[:, :, 0] = -Rs[:, :, 0]
+    Ts = -np.einsum('nj,njk->nk', Ps[:, :3, 3], Rs)
+    FovX = focal2fov(data_infos.focal[0], image.shape[2])
+    FovY = focal2fov(data_infos.focal[0], image.shape[1])
+    cameras = [CameraInfo(uid=idx, R=Rs[idx], T=Ts[idx], FovY=FovY, FovX=FovX, image=image,
+                          image_path=None, image_name=f"{idx}", width=image.shape[2], height=image.shape[1],
+                          time = times[idx], mask=None)
+               for idx in range(len_poses)]
     return cameras
 
 def add_points(pointsclouds, xyz_min, xyz_max):
-    add_points = (np.random.random((100000, 3)))* (xyz_max-xyz_min) + xyz_min
-    add_points = add_points.astype(np.float32)
-    addcolors = np.random.random((100000, 3)).astype(np.float32)
-    addnormals = np.random.random((100000, 3)).astype(np.float32)
+    # one draw for points, colors and normals, split into three (100000, 3) views; the generator is
+    # seeded from the global state so setup_seed/safe_state keep this reproducible
+    extra = np.random.default_rng(np.random.randint(2**32, dtype=np.uint64)).random((100000, 9), dtype=np.float32)
+    add_points = extra[:, 0:3] * (xyz_max-xyz_min) + xyz_min
+    addcolors, addnormals = extra[:, 3:6], extra[:, 6:9]
     # breakpoint()
-    new_points = np.vstack([pointsclouds.points,add_points])
-    new_colors = np.vstack([pointsclouds.colors,addcolors])
-    new_normals = np.vstack([pointsclouds.normals,addnormals])
-    pointsclouds=pointsclouds._replace(points=new_points)
-    pointsclouds=pointsclouds._replace(colors=new_colors)
-    pointsclouds=pointsclouds._replace(normals=new_normals)
+    merged = {}
+    for name, old, new in (("points", pointsclouds.points, add_points), ("colors", pointsclouds.colors, addcolors),
+                           ("normals", pointsclouds.normals, addnormals)):
+        n0 = old.shape[0]
+        merged[name] = np.empty((n0 + new.shape[0], 3), dtype=np.result_type(old, np.float32))
+        merged[name][:n0] = old
+        merged[name][n0:] = new
+    pointsclouds=pointsclouds._replace(**merged)
     return pointsclouds
     # breakpoint()
     # new_
@@ -496,20 +490,24 @@ def readdynerfInfo(datadir,use_bg_points,eval):
 def setup_camera(w, h, k, w2c, near=0.01, far=100):
     from diff_gaussian_rasterization import GaussianRasterizationSettings as Camera
     fx, fy, cx, cy = k[0][0], k[1][1], k[0][2], k[1][2]
-    w2c = torch.tensor(w2c).cuda().float()
-    cam_center = torch.inverse(w2c)[:3, 3]
-    w2c = w2c.unsqueeze(0).transpose(1, 2)
+    w2c = torch.tensor(w2c, dtype=torch.float32)
     opengl_proj = torch.tensor([[2 * fx / w, 0.0, -(w - 2 * cx) / w, 0.0],
                                 [0.0, 2 * fy / h, -(h - 2 * cy) / h, 0.0],
                                 [0.0, 0.0, far / (far - near), -(far * near) / (far - near)],
-                                [0.0, 0.0, 1.0, 0.0]]).cuda().float().unsqueeze(0).transpose(1, 2)
+                                [0.0, 0.0, 1.0, 0.0]], dtype=torch.float32)
+    # invert on the cpu and upload w2c, proj, bg and the camera center with one pinned copy
+    packed = torch.cat([w2c.reshape(-1), opengl_proj.reshape(-1), torch.zeros(3), torch.inverse(w2c)[:3, 3]])
+    packed = packed.pin_memory().to("cuda", non_blocking=True)
+    w2c = packed[:16].view(1, 4, 4).transpose(1, 2)
+    opengl_proj = packed[16:32].view(1, 4, 4).transpose(1, 2)
+    bg, cam_center = packed[32:35], packed[35:38]
     full_proj = w2c.bmm(opengl_proj)
     cam = Camera(
         image_height=h,
         image_width=w,
         tanfovx=w / (2 * fx),
         tanfovy=h / (2 * fy),
-        bg=torch.tensor([0, 0, 0], dtype=torch.float32, device="cuda"),
+        bg=bg,
         scale_modifier=1.0,
         viewmatrix=w2c,
         projmatrix=full_proj,
@@ -531,14 +529,12 @@ def plot_camera_orientations(cam_list, xyz):
                          (xyz[:, 2] >= -threshold) & (xyz[:, 2] <= threshold)]
 
     ax.scatter(xyz[:,0],xyz[:,1],xyz[:,2],c='r',s=0.1)
-    for cam in tqdm(cam_list):
-        # 提取 R 和 T
-        R = cam.R
-        T = cam.T
-
-        direction = R @ np.array([0, 0, 1])
-
-        ax.quiver(T[0], T[1], T[2], direction[0], direction[1], direction[2], length=1)
+    # 提取 R 和 T
+    Rs = np.stack([cam.R for cam in cam_list])
+    Ts = np.stack([cam.T for cam in cam_list])
+    directions = Rs @ np.array([0, 0, 1.])
+    # one quiver artist for all cameras
+    ax.quiver(Ts[:, 0], Ts[:, 1], Ts[:, 2], directions[:, 0], directions[:, 1], directions[:, 2], length=1)
 
     ax.set_xlabel('X Axis')
     ax.set_ylabel('Y Axis')
@@ -670,42 +666,62 @@ def readBrics(datadir, split, start_t: int = 0, num_t: int = 1, downsample: int
         poses.append(pose)
         cam_ids.append(frames[i]['file_path'].split('/')[-2])
     per_cam_poses = np.stack(poses)
+    w2cs = np.linalg.inv(per_cam_poses) # one batched inverse for every camera
 
     # load images and parse cameras
+    frame_ids = [(cam_idx, j) for cam_idx in range(len(cam_ids)) for j in range(start_t, start_t+num_t)]
+    img_paths = [os.path.join(datadir, "frames_1", cam_ids[cam_idx], f"{j:08d}.png") for cam_idx, j in frame_ids]
+    def load(src):
+        # hand back only what the CameraInfo keeps, so loading on the fly never holds more than the frames in flight
+        image, mask = load_img(src, downsample = downsample, white_background = white_background)
+        if load_image_on_the_fly:
+            return image.size, None, None
+        # H,W bool, what the hull init looks up, made here so the float mask is dropped in the worker
+        return image.size, image, mask[..., 0] > 0
+    # decode + composite every frame of every camera on a thread pool, results keep the frame order
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        if IO_URING_FOUND:
+            # io_uring reads one batch of files while the previous batch decodes; waiting on the batch
+            # before that keeps at most two batches of compressed bytes in memory
+            images, decoding = [], []
+            progress = tqdm(total=len(img_paths), desc=f'Loading {split} data ({len(cam_ids)} cameras)')
+            for batch in bulk_read(img_paths):
+                submitted = [executor.submit(load, io.BytesIO(data)) for data in batch]
+                images += [future.result() for future in decoding]
+                progress.update(len(decoding))
+                decoding = submitted
+            images += [future.result() for future in decoding]
+            progress.update(len(decoding))
+            progress.close()
+        else:
+            images = list(tqdm(executor.map(load, img_paths),
+                               total=len(img_paths), desc=f'Loading {split} data ({len(cam_ids)} cameras)'))
+
     cam_infos = []
     camera_dict = {}
-    uid = 0
-    for cam_idx in range(len(cam_ids)):
+    for uid, ((cam_idx, j), img_path, (size, image, mask)) in enumerate(zip(frame_ids, img_paths, images)):
         cam_name = cam_ids[cam_idx]
-        for j in tqdm(range(start_t, start_t+num_t), desc=f'Loading {split} data ({cam_idx}/{len(cam_ids)})'):
-            img_path = os.path.join(datadir, "frames_1", cam_name,  f"{j:08d}.png")
-            # per_cam_imgs.append(img_path)
-            timestamp = j-start_t
-            image_name = os.path.join(cam_name, f"{j:08d}") #Path(os.path.join(f"{cam_name}_{j:06d}").stem
-
-            # load image and mask
-            image, mask = load_img(img_path, downsample = downsample, white_background = white_background)
-            
-            # prep camera parameters
-            # cam_idx = idx
-            FovY = focal2fov(intrinsics.focal_ys[cam_idx], intrinsics.height)
-            FovX = focal2fov(intrinsics.focal_xs[cam_idx], intrinsics.width)
-            w2c = np.linalg.inv(np.array(per_cam_poses[cam_idx]))
-            R, T = np.transpose(w2c[:3, :3]), w2c[:3, 3]
-
-            K = np.array([[
-                intrinsics.focal_xs[cam_idx], 0, intrinsics.center_xs[cam_idx]],
-                [0, intrinsics.focal_ys[cam_idx], intrinsics.center_ys[cam_idx]],
-                [0, 0, 1]]
-            )
-            cam_info = CameraInfo(uid=uid, time=timestamp/float(num_t), R=R, T=T, FovY=FovY, FovX=FovX, K=K,
-                image = image if not load_image_on_the_fly else None, mask = mask if not load_image_on_the_fly else None, 
-                image_path=img_path, image_name=image_name, 
-                width=image.size[0], height=image.size[1], white_background = white_background)
-            uid += 1
-            if timestamp == 0:
-                camera_dict[cam_name] = cam_info # needed for video camera
-            cam_infos.append(cam_info)
+        timestamp = j-start_t
+        image_name = os.path.join(cam_name, f"{j:08d}") #Path(os.path.join(f"{cam_name}_{j:06d}").stem
+
+        # prep camera parameters
+        FovY = focal2fov(intrinsics.focal_ys[cam_idx], intrinsics.height)
+        FovX = focal2fov(intrinsics.focal_xs[cam_idx], intrinsics.width)
+        w2c = w2cs[cam_idx]
+        R, T = np.transpose(w2c[:3, :3]), w2c[:3, 3]
+
+        K = np.array([[
+            intrinsics.focal_xs[cam_idx], 0, intrinsics.center_xs[cam_idx]],
+            [0, intrinsics.focal_ys[cam_idx], intrinsics.center_ys[cam_idx]],
+            [0, 0, 1]]
+        )
+        cam_info = CameraInfo(uid=uid, time=timestamp/float(num_t), R=R, T=T, FovY=FovY, FovX=FovX, K=K,
+            image = image, mask = mask, 
+            image_path=img_path, image_name=image_name, 
+            width=size[0], height=size[1], white_background = white_background)
+        if timestamp == 0:
+            camera_dict[cam_name] = cam_info # needed for video camera
+        cam_infos.append(cam_info)
     return cam_infos, camera_dict
 
 def readBricsSceneInfo(path, num_pts=200_000, white_background=True, start_t=0, num_t=1, init='hull', create_video_cams=True, load_image_on_the_fly = False):
@@ -718,61 +734,85 @@ def readBricsSceneInfo(path, num_pts=200_000, white_background=True, start_t=0,
         first_frame_cameras = [_cam for _cam in train_cam_infos if _cam.time == 0]
         aabb = -3.0, 3.0
         grid_resolution = 128
-        grid = np.linspace(aabb[0], aabb[1], grid_resolution)
-        grid = np.meshgrid(grid, grid, grid)
-        grid_loc = np.stack(grid, axis=-1).reshape(-1, 3) # n_pts, 3
+        # integer lattice straight to float32 points, rows 0/1 swapped to keep meshgrid's 'xy' point order
+        idx = np.mgrid[0:grid_resolution, 0:grid_resolution, 0:grid_resolution].reshape(3, -1)[[1, 0, 2]].astype(np.float32)
+        grid_loc = idx.T * np.float32((aabb[1]-aabb[0])/(grid_resolution-1)) + np.float32(aabb[0]) # n_pts, 3
 
-        # project grid locations to the image plane
-        grid = torch.from_numpy(np.concatenate([grid_loc, np.ones_like(grid_loc[:, :1])], axis=-1)).float() # n_pts, 4
+        # project grid locations to the image plane; the homogeneous 1 is implicit, xyz @ M[:3] + M[3]
+        grid = torch.from_numpy(grid_loc) # n_pts, 3
         # grid_mask = np.ones_like(grid_loc[:, 0], dtype=bool)
         grid_counter = np.ones_like(grid_loc[:, 0], dtype=int)
         zfar = 100.0
         znear = 0.01
         trans=np.array([0.0, 0.0, 0.0])
         scale=1.0
+        hull_cams = []
         for cam in first_frame_cameras:
-            world_view_transform = torch.tensor(getWorld2View2(cam.R, cam.T, trans, scale)).transpose(0, 1)
+            world_view_transform = getWorld2View2(cam.R, cam.T, trans, scale).T
 
             if not load_image_on_the_fly:
-                H, W = cam.image.size[1], cam.image.size[0]
+                img, mask = cam.image, cam.mask
             else:
                 img, mask = load_img(cam.image_path, white_background = white_background)
-                H, W = img.size[1], img.size[0]
-
-            projection_matrix =  getProjectionMatrix(znear=znear, zfar=zfar, fovX=cam.FovX, fovY=cam.FovY, K=cam.K, img_h=H, img_w=W).transpose(0, 1)
-            full_proj_transform = (world_view_transform.unsqueeze(0).bmm(projection_matrix.unsqueeze(0))).squeeze(0)
-            # xyzh = torch.from_numpy(np.concatenate([xyz, np.ones((xyz.shape[0], 1))], axis=1)).float()
-            cam_xyz = grid @ full_proj_transform # (full_proj_transform @ xyzh.T).T
-            uv = cam_xyz[:, :2] / cam_xyz[:, 2:3] # xy coords
-            # H, W = cam.image.size[1], cam.image.size[0]
-            uv = ndc2Pix(uv, np.array([W, H]))
-            uv = np.round(uv.numpy()).astype(int)
-
-            valid_inds = (uv[:, 0] >= 0) & (uv[:, 0] < W) & (uv[:, 1] >= 0) & (uv[:, 1] < H) 
-            # _pix_mask = (uv[:, 0] >= 0) & (uv[:, 0] < W) & (uv[:, 1] >= 0) & (uv[:, 1] < H)
-            if not load_image_on_the_fly:
-                cam_mask = np.array(cam.mask) # H,W,1
-            else:
-                cam_mask = np.array(mask) # H,W,1
-            # _pix_mask[_pix_mask] = cam_mask[uv[valid_inds][:, 1], uv[valid_inds][:, 0]].reshape(-1) > 0
-
-            _m = cam_mask[uv[valid_inds][:, 1], uv[valid_inds][:, 0]].reshape(-1) > 0
-            # grid_mask[valid_inds] = grid_mask[valid_inds] & _m
-            grid_counter[valid_inds] = grid_counter[valid_inds] + _m
-            print('grid_counter=', np.mean(grid_counter))
-
-            if True:
-                cam_img = np.array(cam.image if not load_image_on_the_fly else img).copy()
-                red_uv = uv[valid_inds][_m > 0]
-                cam_img[red_uv[:, 1], red_uv[:, 0]] = np.array([255, 0, 0])
-                # save cam_img
-                imageio.imsave(f'./cam_img.png', cam_img)
-                # breakpoint()
-
+                mask = mask[..., 0] > 0
+            H, W = cam.height, cam.width # readBrics stores the decoded image size
+
+            projection_matrix =  getProjectionMatrix(znear=znear, zfar=zfar, fovX=cam.FovX, fovY=cam.FovY, K=cam.K, img_h=H, img_w=W).numpy().T
+            # plain numpy 4x4 product, a 1-batch torch bmm here is all dispatch overhead
+            full_proj_transform = world_view_transform @ projection_matrix
+            hull_cams.append((full_proj_transform, mask, img, H, W)) # mask: H,W bool
+
+        projs = np.stack([fp for fp, _, _, _, _ in hull_cams]).astype(np.float32) # C, 4, 4
+        # the debug image reuses the batched pass's pixel coordinates, which the fused kernel never materializes
+        if NUMBA_FOUND and not DEBUG_SAVE_CAM_IMG:
+            # one fused parallel pass over points instead of a projection per camera
+            masks, sizes = stack_masks([cam_mask for _, cam_mask, _, _, _ in hull_cams])
+            grid_counter += count_visible(np.ascontiguousarray(grid_loc, dtype=np.float32), projs, masks, sizes)
+        else:
+            # project the grid through a batch of cameras with one bmm; batches bound the C x n_pts x 4 intermediate
+            hull_cam_batch = 8
+            # the projection runs on the gpu when there is one and the grid is big enough to amortize the upload
+            device = "cuda" if torch.cuda.is_available() and grid.shape[0] >= 1 << 16 else "cpu"
+            grid_dev = grid.to(device, non_blocking=True)
+            projs_dev = torch.from_numpy(projs).to(device, non_blocking=True)
+            sizes_dev = torch.tensor([[W, H] for _, _, _, H, W in hull_cams], dtype=torch.float32, device=device).unsqueeze(1) # C, 1, 2
+            for c0 in range(0, len(hull_cams), hull_cam_batch):
+                # xyzh = torch.from_numpy(np.concatenate([xyz, np.ones((xyz.shape[0], 1))], axis=1)).float()
+                cam_projs = projs_dev[c0:c0+hull_cam_batch]
+                # (full_proj_transform @ xyzh.T).T as one fused xyz @ M[:3] + M[3], C_b, n_pts, 4
+                cam_xyz = torch.baddbmm(cam_projs[:, 3:4], grid_dev.expand(cam_projs.shape[0], -1, -1), cam_projs[:, :3])
+                uv_batch = cam_xyz[..., :2] / cam_xyz[..., 2:3] # xy coords
+                # ndc2Pix in place on the fresh uv tensor: ((uv + 1) * S - 1) * 0.5
+                uv_batch.add_(1).mul_(sizes_dev[c0:c0+hull_cam_batch]).sub_(1).mul_(0.5)
+                # round and narrow to int32 before the transfer, one copy per batch at half the bytes of int64
+                uv_batch = uv_batch.round_().to(torch.int32).cpu()
+                for (_, cam_mask, img, H, W), uv in zip(hull_cams[c0:c0+hull_cam_batch], uv_batch):
+                    # H, W = cam.image.size[1], cam.image.size[0]
+                    uv = uv.numpy()
+
+                    valid_inds = in_bounds(uv, W, H)
+                    # _pix_mask = (uv[:, 0] >= 0) & (uv[:, 0] < W) & (uv[:, 1] >= 0) & (uv[:, 1] < H)
+                    # _pix_mask[_pix_mask] = cam_mask[uv[valid_inds][:, 1], uv[valid_inds][:, 0]].reshape(-1) > 0
+
+                    # clamp into the image and gather the mask densely for every point, the bounds test then
+                    # discards the clamped out-of-image hits; no boolean compaction of uv
+                    xs = np.clip(uv[:, 0], 0, W - 1)
+                    ys = np.clip(uv[:, 1], 0, H - 1)
+                    _m = cam_mask[ys, xs]
+                    _m &= valid_inds
+                    # grid_mask[valid_inds] = grid_mask[valid_inds] & _m
+                    grid_counter += _m
+
+                    if DEBUG_SAVE_CAM_IMG:
+                        cam_img = np.array(img) # np.array already copies the PIL image
+                        cam_img[ys[_m], xs[_m]] = np.array([255, 0, 0])
+                        # save cam_img
+                        imageio.imsave(f'./cam_img.png', cam_img)
+                        # breakpoint()
+
+        print('grid_counter=', np.mean(grid_counter))
         grid_mask = grid_counter > 15 # at least 10 cameras should see the point
-        xyz = grid[:, :3].numpy()[grid_mask]
-        colors = np.random.random((xyz.shape[0], 3)) / 255.0
-        pcd = BasicPointCloud(points=xyz, colors=colors, normals=np.zeros_like(xyz))
+        xyz = grid_loc[grid_mask]
         ply_path = os.path.join(tempfile._get_default_tempdir(), f"{next(tempfile._get_candidate_names())}_{str(uuid.uuid4())}.ply") #os.path.join(path, "points3d.ply")
 
     else:
@@ -780,7 +820,10 @@ def readBricsSceneInfo(path, num_pts=200_000, white_background=True, start_t=0,
 
     # sub sample points if needed
     if xyz.shape[0] > num_pts:
-        xyz = xyz[np.random.choice(xyz.shape[0], num_pts, replace=False)]
+        # shuffle=False skips permuting the picked indices, their order does not matter for the point cloud;
+        # the generator is seeded from the global state so the initial point cloud stays reproducible
+        rng = np.random.default_rng(np.random.randint(2**32, dtype=np.uint64))
+        xyz = xyz[rng.choice(xyz.shape[0], size=num_pts, replace=False, shuffle=False)]
     colors = np.random.random((xyz.shape[0], 3)) / 255.0
     pcd = BasicPointCloud(points=xyz, colors=colors, normals=np.zeros_like(xyz))
     storePly(ply_path, xyz, colors)
@@ -788,25 +831,25 @@ def readBricsSceneInfo(path, num_pts=200_000, white_background=True, start_t=0,
     # create visualization cameras
     video_cameras = []
     if create_video_cams:
-        vis_C2W = []
         vis_cam_order = ['cam01', 'cam04', 'cam09', 'cam15', 'cam23', 'cam28', 'cam32', 'cam34', 'cam35', 'cam36', 'cam37'] + ['cam01', 'cam04']
         cam_id_order = [train_camera_dict[vis_cam_id] for vis_cam_id in vis_cam_order]
-        for cam in cam_id_order:
-            Rt = np.eye(4)
-            Rt[:3, :3] = cam.R
-            Rt[:3, 3] = cam.T
-            vis_C2W.append(np.linalg.inv(Rt))
-        vis_C2W = np.stack(vis_C2W)[:, :3, :4]
+        # fill the w2c stack in place and invert it in one call
+        vis_C2W = np.tile(np.eye(4), (len(cam_id_order), 1, 1))
+        for i, cam in enumerate(cam_id_order):
+            vis_C2W[i, :3, :3] = cam.R
+            vis_C2W[i, :3, 3] = cam.T
+        vis_C2W = np.linalg.inv(vis_C2W)[:, :3, :4]
         # interpolate between cameras
         visualization_poses = generate_interpolated_path(vis_C2W, 50, spline_degree=3, smoothness=0.0, rot_weight=0.01)
         video_cam_centers = []
         # timesteps = list(range(start_t, start_t+num_t))
         timesteps = list(range(0, num_t))
         timesteps_rev = timesteps + timesteps[::-1]
-        for _idx, _pose in enumerate(visualization_poses):
-            Rt = np.eye(4)
-            Rt[:3, :4] = _pose[:3, :4]
-            Rt = np.linalg.inv(Rt)
+        # invert every interpolated c2w in one batched call
+        Rts = np.tile(np.eye(4), (len(visualization_poses), 1, 1))
+        Rts[:, :3, :4] = visualization_poses[:, :3, :4]
+        Rts = np.linalg.inv(Rts)
+        for _idx, (_pose, Rt) in enumerate(zip(visualization_poses, Rts)):
             R = Rt[:3, :3]
             T = Rt[:3, 3]
             video_cameras.append(CameraInfo(
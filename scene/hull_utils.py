@@ -0,0 +1,58 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_FOUND = True
+except ImportError:
+    NUMBA_FOUND = False
+
+try:
+    import numexpr as ne
+    NUMEXPR_FOUND = True
+except ImportError:
+    NUMEXPR_FOUND = False
+
+
+def stack_masks(masks):
+    # pad the per-camera masks to a common (C, Hmax, Wmax) uint8 block, keeping each true (H, W)
+    sizes = np.array([mask.shape[:2] for mask in masks], dtype=np.int64)
+    stacked = np.zeros((len(masks), sizes[:, 0].max(), sizes[:, 1].max()), dtype=np.uint8)
+    for c, mask in enumerate(masks):
+        stacked[c, :mask.shape[0], :mask.shape[1]] = mask.reshape(mask.shape[0], mask.shape[1]) > 0
+    return stacked, sizes
+
+
+def in_bounds(uv, W, H):
+    # (N, 2) int32 pixel coords -> inside-image mask in one pass without the four boolean temporaries
+    if NUMEXPR_FOUND:
+        return ne.evaluate("(u >= 0) & (u < W) & (v >= 0) & (v < H)", {"u": uv[:, 0], "v": uv[:, 1], "W": W, "H": H})
+    # negative coords wrap to huge values as uint32, so one compare per axis covers both bounds
+    uv = uv.view(np.uint32)
+    return (uv[:, 0] < W) & (uv[:, 1] < H)
+
+
+if NUMBA_FOUND:
+    @njit(parallel=True, cache=True)
+    def count_visible(grid_xyz, projs, masks, sizes):
+        """
+        For every grid point, count the cameras whose mask covers its projection.
+
+        grid_xyz: (N, 3) float32 points, projs: (C, 4, 4) row-vector full projection transforms
+        (as used by `xyzh @ full_proj_transform`), masks/sizes: output of `stack_masks`.
+        Projection, depth divide, ndc2Pix, rounding, bounds test and mask lookup are fused
+        into one pass; the loop runs in parallel over points so counts never race.
+        """
+        counter = np.zeros(grid_xyz.shape[0], dtype=np.int64)
+        for i in prange(grid_xyz.shape[0]):
+            x, y, z = grid_xyz[i, 0], grid_xyz[i, 1], grid_xyz[i, 2]
+            for c in range(projs.shape[0]):
+                fp = projs[c]
+                H, W = sizes[c, 0], sizes[c, 1]
+                px = x * fp[0, 0] + y * fp[1, 0] + z * fp[2, 0] + fp[3, 0]
+                py = x * fp[0, 1] + y * fp[1, 1] + z * fp[2, 1] + fp[3, 1]
+                pz = x * fp[0, 2] + y * fp[1, 2] + z * fp[2, 2] + fp[3, 2]
+                u = np.rint(((px / pz + 1.0) * W - 1.0) * 0.5)
+                v = np.rint(((py / pz + 1.0) * H - 1.0) * 0.5)
+                if u >= 0 and u < W and v >= 0 and v < H and masks[c, int(v), int(u)]:
+                    counter[i] += 1
+        return counter
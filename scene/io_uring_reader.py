@@ -0,0 +1,57 @@
+import os
+import sys
+
+# written against the liburing (python binding) 2024.5.3 API; optional, like the other accelerators
+try:
+    from liburing import io_uring, io_uring_cqe, io_uring_queue_init, io_uring_queue_exit, io_uring_get_sqe, \
+        io_uring_prep_read, io_uring_sqe_set_data64, io_uring_submit_and_wait, io_uring_wait_cqe, \
+        io_uring_cqe_get_data64, io_uring_cqe_seen
+    IO_URING_FOUND = sys.platform.startswith('linux')
+except ImportError:
+    IO_URING_FOUND = False
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def bulk_read(paths, queue_depth=256):
+    """
+    Read whole files, submitting up to `queue_depth` reads per io_uring batch.
+    Yields one list of bytes per batch, in the order of `paths`, so callers can decode a batch
+    while the next one is read and never hold more than a batch or two in memory. Without
+    liburing (or off Linux) it falls back to plain reads with the same batching.
+    """
+    if not IO_URING_FOUND:
+        for start in range(0, len(paths), queue_depth):
+            yield [_read_file(path) for path in paths[start:start + queue_depth]]
+        return
+
+    ring, cqe = io_uring(), io_uring_cqe()
+    io_uring_queue_init(queue_depth, ring, 0)
+    try:
+        for start in range(0, len(paths), queue_depth):
+            batch = range(start, min(start + queue_depth, len(paths)))
+            fds, bufs = {}, {}
+            try:
+                for i in batch:
+                    fds[i] = os.open(paths[i], os.O_RDONLY)
+                    bufs[i] = bytearray(os.fstat(fds[i]).st_size)
+                    sqe = io_uring_get_sqe(ring)
+                    io_uring_prep_read(sqe, fds[i], bufs[i], len(bufs[i]), 0)
+                    io_uring_sqe_set_data64(sqe, i)
+                io_uring_submit_and_wait(ring, len(batch))
+                for _ in batch:
+                    io_uring_wait_cqe(ring, cqe)
+                    i, res = io_uring_cqe_get_data64(cqe), cqe.res
+                    io_uring_cqe_seen(ring, cqe)
+                    if res < 0:
+                        raise OSError(-res, os.strerror(-res), paths[i])
+                    if res < len(bufs[i]): # short read, finish the tail synchronously
+                        bufs[i][res:] = os.pread(fds[i], len(bufs[i]) - res, res)
+            finally:
+                for fd in fds.values():
+                    os.close(fd)
+            yield [bytes(bufs[i]) for i in batch]
+    finally:
+        io_uring_queue_exit(ring)
@@ -1,4 +1,5 @@
 import os
+import functools
 import numpy as np
 from torch.utils.data import Dataset
 from PIL import Image
@@ -9,6 +10,12 @@ from scene.neural_3D_dataset_NDC import get_spiral
 from torchvision import transforms as T
 
 
+@functools.lru_cache(maxsize=None)
+def count_frames(folder):
+    # the train and test splits both count the same folder; scandir avoids building the name list
+    with os.scandir(folder) as entries:
+        return sum(1 for _ in entries)
+
 class multipleview_dataset(Dataset):
     def __init__(
         self,
@@ -29,7 +36,7 @@ class multipleview_dataset(Dataset):
         
     
     def load_images_path(self, cam_folder, cam_extrinsics,cam_intrinsics,split):
-        image_length = len(os.listdir(os.path.join(cam_folder,"cam01")))
+        image_length = count_frames(os.path.join(cam_folder,"cam01"))
         #len_cam=len(cam_extrinsics)
         image_paths=[]
         image_poses=[]
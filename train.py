@@ -17,7 +17,7 @@ from utils.loss_utils import l1_loss, ssim, l2_loss, lpips_loss
 from gaussian_renderer import render, network_gui
 import sys
 from scene import Scene, GaussianModel
-from utils.general_utils import safe_state
+from utils.general_utils import safe_state, resolve_lazy_images
 import uuid
 from tqdm import tqdm
 from utils.image_utils import psnr
@@ -84,12 +84,16 @@ def scene_reconstruction(dataset, opt, hyper, pipe, testing_iterations, saving_i
     print("data loading done")
     if opt.dataloader:
         viewpoint_stack = scene.getTrainCameras()
+        # cameras kept on the cpu get their gt image pinned by the loader, see Camera.pin_memory
+        pin_memory = dataset.load2gpu_on_the_fly and scene.dataset_type!="PanopticSports"
+        if opt.num_workers > 0 and isinstance(viewpoint_stack.dataset, list):
+            resolve_lazy_images(viewpoint_stack.dataset)
         if opt.custom_sampler is not None:
             sampler = FineSampler(viewpoint_stack)
-            viewpoint_stack_loader = DataLoader(viewpoint_stack, batch_size=batch_size,sampler=sampler,num_workers=opt.num_workers,collate_fn=list)
+            viewpoint_stack_loader = DataLoader(viewpoint_stack, batch_size=batch_size,sampler=sampler,num_workers=opt.num_workers,collate_fn=list,pin_memory=pin_memory)
             random_loader = False
         else:
-            viewpoint_stack_loader = DataLoader(viewpoint_stack, batch_size=batch_size,shuffle=True,num_workers=opt.num_workers,collate_fn=list)
+            viewpoint_stack_loader = DataLoader(viewpoint_stack, batch_size=batch_size,shuffle=True,num_workers=opt.num_workers,collate_fn=list,pin_memory=pin_memory)
             random_loader = True
         loader = iter(viewpoint_stack_loader)
     
@@ -150,7 +154,7 @@ def scene_reconstruction(dataset, opt, hyper, pipe, testing_iterations, saving_i
             except StopIteration:
                 print("reset dataloader into random dataloader.")
                 if not random_loader:
-                    viewpoint_stack_loader = DataLoader(viewpoint_stack, batch_size=opt.batch_size,shuffle=True,num_workers=opt.num_workers,collate_fn=list)
+                    viewpoint_stack_loader = DataLoader(viewpoint_stack, batch_size=opt.batch_size,shuffle=True,num_workers=opt.num_workers,collate_fn=list,pin_memory=pin_memory)
                     random_loader = True
                 loader = iter(viewpoint_stack_loader)
 
@@ -190,7 +194,7 @@ def scene_reconstruction(dataset, opt, hyper, pipe, testing_iterations, saving_i
                 images.append(image.unsqueeze(0))
             
             if scene.dataset_type!="PanopticSports":
-                gt_image = viewpoint_cam.original_image.cuda()
+                gt_image = viewpoint_cam.original_image.cuda(non_blocking=True)
             else:
                 gt_image  = viewpoint_cam['image'].cuda()
             
@@ -11,7 +11,7 @@
 
 from scene.cameras import Camera
 import numpy as np
-from utils.general_utils import PILtoTorch
+from utils.general_utils import PILtoTorch, LazyImage
 from utils.image_utils import load_img
 from utils.graphics_utils import fov2focal
 import json
@@ -125,7 +125,9 @@ def loadCam(args, id, cam_info, resolution_scale):
         scale = float(global_down) * float(resolution_scale)
         resolution = (int(orig_w / scale), int(orig_h / scale))
 
-    if cam_info.image is not None: 
+    if isinstance(cam_info.image, LazyImage):
+        resized_image_rgb = PILtoTorch(cam_info.image.tensor, resolution)
+    elif cam_info.image is not None: 
         resized_image_rgb = PILtoTorch(cam_info.image, resolution)
     else:
         image, mask = load_img(cam_info.image_path, white_background = cam_info.white_background)
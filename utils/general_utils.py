@@ -11,6 +11,8 @@
 
 import torch
 import sys
+import functools
+from PIL import Image
 from datetime import datetime
 import numpy as np
 import random
@@ -32,6 +34,32 @@ def PILtoTorch(pil_image, resolution):
     else:
         return resized_image.unsqueeze(dim=-1).permute(2, 0, 1)
 
+class LazyImage:
+    # defers the decode of a camera image until something first reads .tensor, then keeps it
+    def __init__(self, image_path):
+        self.image_path = image_path
+
+    @functools.cached_property
+    def tensor(self):
+        return PILtoTorch(Image.open(self.image_path), None)
+
+def resolve_lazy_images(cam_infos):
+    # the cached decode only lives in the process that made it: decode in the parent before DataLoader
+    # workers fork, otherwise every worker (and every rebuilt loader) decodes every image again
+    for cam_info in cam_infos:
+        if isinstance(cam_info.image, LazyImage):
+            cam_info.image.tensor
+
+def NPtoTorch(np_image, resolution):
+    # uint8 HxWxC array straight to a float CHW tensor in [0, 1], without a PIL round-trip;
+    # resolution is (W, H) like in PILtoTorch, resizing is bicubic like PIL's default, and antialiased
+    # on downscales like PIL's resize
+    image = torch.from_numpy(np.ascontiguousarray(np_image)).permute(2, 0, 1).float().div_(255.0)
+    if resolution is not None and tuple(resolution) != (image.shape[2], image.shape[1]):
+        image = torch.nn.functional.interpolate(image.unsqueeze(0), size=(resolution[1], resolution[0]),
+                                                mode='bicubic', align_corners=False, antialias=True).squeeze(0).clamp_(0.0, 1.0)
+    return image
+
 def get_expon_lr_func(
     lr_init, lr_final, lr_delay_steps=0, lr_delay_mult=1.0, max_steps=1000000
 ):
@@ -9,9 +9,17 @@
 # For inquiries contact  george.drettakis@inria.fr
 #
 
+import io
 import torch
 from PIL import Image
 import numpy as np
+try:
+    import pyspng
+    PYSPNG_FOUND = True
+except ImportError:
+    PYSPNG_FOUND = False
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 
 def mse(img1, img2):
     return (((img1 - img2)) ** 2).view(img1.shape[0], -1).mean(1, keepdim=True)
@@ -40,19 +48,53 @@ def psnr(img1, img2, mask=None):
     return psnr
 
 
-def load_img(img_path, downsample: int = 1, white_background: bool = False):
-    image = Image.open(img_path)
-    
-    if downsample > 1:
-        image = image.resize((image.size[0]//downsample, image.size[1]//downsample), Image.ANTIALIAS)
-    im_data = np.array(image.convert("RGBA"))
+def composite_rgba(im_data, white_background: bool = False):
+    # alpha-blend an HxWx4 uint8 image over a black/white background in uint16 integer math,
+    # rounding to nearest; never leaves uint8/uint16 so no float64 HxWx4 temporaries are made
+    alpha = im_data[..., 3:4].astype(np.uint16)
+    out = im_data[..., :3].astype(np.uint16)
+    out *= alpha
+    if white_background:
+        np.subtract(255, alpha, out=alpha)
+        alpha *= 255
+        out += alpha
+    out += 127
+    out //= 255
+    return out.astype(np.uint8)
 
-    bg = np.array([1, 1, 1]) if white_background else np.array([0, 0, 0])
+def read_rgba(src):
+    # HxWx4 uint8 from a path or file object; 8-bit RGB(A) PNGs are decoded straight to numpy by pyspng,
+    # anything else (jpg, grayscale, 16-bit, palette) goes through PIL
+    if PYSPNG_FOUND:
+        if hasattr(src, 'read'):
+            data = src.read()
+        else:
+            with open(src, 'rb') as f:
+                data = f.read()
+        if data.startswith(PNG_SIGNATURE):
+            im_data = pyspng.load(data)
+            if im_data.dtype == np.uint8 and im_data.ndim == 3 and im_data.shape[2] == 4:
+                return im_data
+            if im_data.dtype == np.uint8 and im_data.ndim == 3 and im_data.shape[2] == 3:
+                return np.concatenate([im_data, np.full_like(im_data[..., :1], 255)], axis=-1)
+        src = io.BytesIO(data)
+    return np.array(Image.open(src).convert("RGBA"))
 
-    norm_data = im_data / 255.0
-    mask = norm_data[..., 3:4]
+def load_img(img_path, downsample: int = 1, white_background: bool = False):
+    im_data = read_rgba(img_path)
+    # composite at full resolution first: blending is linear, so downsampling the composite equals
+    # resampling premultiplied RGBa like PIL does, and the RGB of transparent pixels never bleeds in
+    rgb, alpha = composite_rgba(im_data, white_background), im_data[..., 3:4]
+
+    if downsample > 1:
+        # box-average by the integer factor with torch's (multi-threaded) area kernel instead of PIL
+        im_data = np.concatenate([rgb, alpha], axis=-1)
+        resized = torch.nn.functional.interpolate(torch.from_numpy(im_data).permute(2, 0, 1).unsqueeze(0).float(),
+                                                  size=(im_data.shape[0]//downsample, im_data.shape[1]//downsample), mode='area')
+        im_data = resized.squeeze(0).permute(1, 2, 0).round_().to(torch.uint8).numpy()
+        rgb, alpha = im_data[..., :3], im_data[..., 3:4]
 
-    arr = norm_data[:, :, :3] * norm_data[:, :, 3:4] + bg * (1 - norm_data[:, :, 3:4])
-    image = Image.fromarray(np.array(arr * 255.0, dtype=np.byte), "RGB")
+    mask = alpha / 255.0
+    image = Image.fromarray(np.ascontiguousarray(rgb), "RGB")
 
     return image, mask
\ No newline at end of file